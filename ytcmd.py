@@ -1,70 +1,54 @@
-from datetime import datetime
-import os
-import subprocess
-import sys
-
-import yt_dlp
+import ytdl_core
+from ytdl_core import DEFAULT_CHUNK_SIZE, DEFAULT_JOBS
 
 
 class YTDownloader:
-    def __init__(self):
-        pass
+    """
+    Class interface to the helpers in ytdl_core, keeping the download settings
+    on the instance.
 
-    def check_ffmpeg(self):
-        """
-        Check if FFmpeg is installed and accessible.
-        Returns True if FFmpeg is available, False otherwise.
-        """
-        try:
-            subprocess.run(['ffmpeg', '-version'], capture_output=True)
-            return True
-        except FileNotFoundError:
-            return False
-        
-    def format_size(self, bytes):
+    download_video() reuses one YoutubeDL across calls, so connections stay
+    alive between videos. Use the downloader as a context manager, or call
+    close(), to release it.
+    """
+    check_ffmpeg = staticmethod(ytdl_core.check_ffmpeg)
+    check_impersonation = staticmethod(ytdl_core.check_impersonation)
+    format_size = staticmethod(ytdl_core.format_size)
+    progress_hook = staticmethod(ytdl_core.progress_hook)
+    get_best_format = staticmethod(ytdl_core.get_best_format)
+    mux_streams = staticmethod(ytdl_core.mux_streams)
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
         """
-        Convert bytes to human readable format, making file sizes easier to understand.
-        Scales from bytes up to gigabytes automatically.
+        Args:
+            chunk_size (int): Size of each ranged HTTP request in bytes, or None to
+                download each stream with a single request
         """
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes < 1024:
-                return f"{bytes:.2f} {unit}"
-            bytes /= 1024
-        return f"{bytes:.2f} GB"
-    
-    def progress_hook(self, d):
+        self.chunk_size = chunk_size
+        self._ydl = None
+        self._ydl_output_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
         """
-        Display download progress with detailed information about speed and time remaining.
-        Provides real-time feedback during the download process.
+        Close the YoutubeDL instance reused by download_video(), if any.
         """
-        if d['status'] == 'downloading':
-            downloaded = d.get('downloaded_bytes', 0)
-            total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-            
-            if total:
-                percentage = (downloaded / total) * 100
-                speed = d.get('speed', 0)
-                speed_str = self.format_size(speed) + '/s' if speed else 'N/A'
-                
-                eta = d.get('eta', None)
-                eta_str = str(datetime.fromtimestamp(eta).strftime('%M:%S')) if eta else 'N/A'
-                
-                progress = f"\rProgress: {percentage:.1f}% | Speed: {speed_str} | ETA: {eta_str}"
-                sys.stdout.write(progress)
-                sys.stdout.flush()
+        if self._ydl is not None:
+            self._ydl.close()
+            self._ydl = None
+            self._ydl_output_path = None
 
-    def get_best_format(self, formats, target_height, ffmpeg_available):
+    def build_ydl_opts(self, output_path):
         """
-        Select the best video format based on desired quality and FFmpeg availability.
-        Handles both cases where FFmpeg is available and where it isn't.
+        Build the yt-dlp options shared by single and batch downloads.
         """
-        if ffmpeg_available:
-            # When FFmpeg is available, we can use separate video and audio streams
-            return f'bestvideo[height<={target_height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={target_height}][ext=mp4]/best'
-        else:
-            # When FFmpeg isn't available, we need a merged format
-            return f'best[height<={target_height}][ext=mp4]/best[ext=mp4]/best'
-        
+        return ytdl_core.build_ydl_opts(output_path, self.chunk_size)
+
     def download_video(self, url, preferred_quality=None, output_path='downloads'):
         """
         Download a YouTube video with specified quality using yt-dlp.
@@ -72,84 +56,32 @@ class YTDownloader:
         
         Args:
             url (str): YouTube video URL
-            preferred_quality (str): Preferred video quality (e.g., '720p', '1080p')
+            preferred_quality (str or int): Preferred video quality (e.g., '720p', '1080p' or 720)
             output_path (str): Directory to save the downloaded video
-        """
-        try:
-            # Check if FFmpeg is available
-            ffmpeg_available = self.check_ffmpeg()
-
-            if not ffmpeg_available:
-                print("\nNotice: FFmpeg is not installed. Some high-quality options may be limited.")
-                print("The script will automatically select the best available compatible format.")
-                print("To enable all quality options, please install FFmpeg and add it to your system PATH.")
 
-            # Create output directory if it doesn't exist
-            if not os.path.exists(output_path):
-                os.makedirs(output_path)
-
-            # Configure yt-dlp options
-            ydl_opts = {
-                'progress_hooks': [self.progress_hook],
-                'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-                'verbose': False
-            }
+        Returns:
+            bool: True if the video was downloaded, False otherwise
+        """
+        # The options depend on output_path, so a new instance is needed when it changes
+        if self._ydl is None or self._ydl_output_path != output_path:
+            self.close()
+            self._ydl = ytdl_core.create_ydl(self.build_ydl_opts(output_path))
+            self._ydl_output_path = output_path
+        return ytdl_core.download_video(url, preferred_quality, output_path, self.chunk_size, ydl=self._ydl)
 
-            print("Fetching video information...")
-        
-            # Create a yt-dlp object and get video info
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Get video information
-                info = ydl.extract_info(url, download=False)
-                
-                # Display video information
-                print(f"\nVideo Title: {info.get('title', 'Unknown')}")
-                duration = int(info.get('duration', 0))
-                print(f"Duration: {duration // 60}:{duration % 60:02d}")
-                
-                # Get available formats and filter based on FFmpeg availability
-                formats = info.get('formats', [])
-                quality_set = set()
-                
-                # Collect available qualities, considering FFmpeg availability
-                for f in formats:
-                    height = f.get('height')
-                    # If FFmpeg isn't available, only include formats that have both video and audio
-                    if height and (ffmpeg_available or f.get('acodec') != 'none'):
-                        quality_set.add(f"{height}p")
-                
-                # Sort qualities from lowest to highest
-                quality_list = sorted(quality_set, key=lambda x: int(x.replace('p', '')))
-                
-                print("\nAvailable qualities:")
-                for i, quality in enumerate(quality_list, 1):
-                    print(f"{i}. {quality}")
+    async def download_many(self, urls, preferred_quality=None, output_path='downloads', concurrency=DEFAULT_JOBS):
+        """
+        Download several YouTube videos concurrently using yt-dlp.
+        Quality is not prompted for in batch mode; without a preferred quality
+        the best available format is downloaded.
 
-                # Handle quality selection
-                if not preferred_quality or preferred_quality not in quality_set:
-                    print("\nPlease select a quality from the available options:")
-                    while True:
-                        try:
-                            choice = int(input("Enter the number of your choice: "))
-                            if 1 <= choice <= len(quality_list):
-                                preferred_quality = quality_list[choice-1]
-                                break
-                            else:
-                                print("Invalid choice. Please try again.")
-                        except ValueError:
-                            print("Please enter a valid number.")
+        Args:
+            urls (list): YouTube video URLs
+            preferred_quality (str or int): Preferred video quality (e.g., '720p', '1080p' or 720)
+            output_path (str): Directory to save the downloaded videos
+            concurrency (int): Maximum number of videos downloaded at the same time
 
-                # Set format based on selected quality and FFmpeg availability
-                height = int(preferred_quality.replace('p', ''))
-                ydl_opts['format'] = self.get_best_format(formats, height, ffmpeg_available)
-                
-                print(f"\nDownloading video in {preferred_quality}...")
-                
-                # Download the video
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-                
-                print("\nDownload completed successfully!")
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            return False
\ No newline at end of file
+        Returns:
+            list: 0 or the raised exception for each URL, in order
+        """
+        return await ytdl_core.download_many(urls, preferred_quality, output_path, concurrency, self.chunk_size)
\ No newline at end of file
@@ -0,0 +1,596 @@
+"""
+Download helpers shared by yt-dowloader.py and ytcmd.py.
+
+yt_dlp is imported inside the functions that use it, as loading its
+extractors is slow and isn't needed until a download starts.
+"""
+import os
+import asyncio
+import contextlib
+import functools
+import hashlib
+import importlib.util
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+
+# Size of each ranged HTTP request made by yt-dlp (10 MiB)
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+# Number of DASH fragments downloaded in parallel
+CONCURRENT_FRAGMENTS = 8
+# Number of videos downloaded at the same time in batch mode
+DEFAULT_JOBS = 4
+# Number of times a failed download or fragment is retried
+RETRIES = 10
+# Longest wait between retries, in seconds
+MAX_RETRY_SLEEP = 60
+# Browser impersonated by yt-dlp when a supported curl_cffi is installed
+IMPERSONATE_TARGET = 'chrome'
+# Filename template for downloaded videos
+OUTPUT_TEMPLATE = '%(title)s.%(ext)s'
+# Filename template for batch downloads whose title is already taken by another video
+UNIQUE_OUTPUT_TEMPLATE = '%(title)s [%(id)s].%(ext)s'
+# Filename template for the separate video and audio streams muxed in batch mode.
+# The streams are kept in the scratch directory until they are muxed, so the
+# video id is included to keep videos with the same title apart.
+STREAM_TEMPLATE = '%(title)s [%(id)s].f%(format_id)s.%(ext)s'
+# Minimum number of seconds between progress updates
+PROGRESS_INTERVAL = 0.1
+# Units used by format_size, each 1024 times the previous one
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Time of the last progress update, shared by all downloads
+_last_print = [0.0]
+
+# Set when a batch download is cancelled. The downloads run in worker
+# threads, which can't be interrupted, so progress_hook stops them instead.
+_cancel_event = threading.Event()
+
+# Progress is written straight to the stdout file descriptor, bypassing the
+# locking and buffering of sys.stdout. Falls back to print() when stdout has
+# no file descriptor, e.g. when it is replaced by an IDE.
+try:
+    _STDOUT_FD = sys.stdout.fileno()
+except (AttributeError, OSError, ValueError):
+    _STDOUT_FD = None
+
+
+@functools.lru_cache(maxsize=1)
+def check_ffmpeg():
+    """
+    Check if FFmpeg is installed and accessible.
+    Returns True if FFmpeg is available, False otherwise.
+    The result is cached, so PATH is only searched once per process.
+    """
+    return shutil.which('ffmpeg') is not None
+
+
+@functools.lru_cache(maxsize=1)
+def check_impersonation():
+    """
+    Check if yt-dlp can impersonate IMPERSONATE_TARGET, which needs curl_cffi
+    in a version yt-dlp supports.
+    Returns True if impersonation is available, False otherwise.
+    """
+    # Avoid importing yt_dlp's networking code when curl_cffi isn't even installed
+    if importlib.util.find_spec('curl_cffi') is None:
+        return False
+
+    try:
+        # _REQUEST_HANDLERS is private to yt-dlp and may move between releases
+        from yt_dlp.networking.common import _REQUEST_HANDLERS
+        from yt_dlp.networking.impersonate import ImpersonateRequestHandler, ImpersonateTarget
+    except ImportError:
+        return False
+
+    # yt-dlp only registers its curl_cffi handler when the installed version is supported
+    target = ImpersonateTarget.from_str(IMPERSONATE_TARGET)
+    return any(target in supported
+               for handler in _REQUEST_HANDLERS.values()
+               if issubclass(handler, ImpersonateRequestHandler)
+               for supported in handler.supported_targets)
+
+
+def format_size(bytes):
+    """
+    Convert bytes to human readable format, making file sizes easier to understand.
+    Scales from bytes up to terabytes automatically.
+    """
+    # Every unit is 2**10 times the previous one, so the unit index is the bit length divided by 10
+    i = min(max(int(bytes).bit_length() - 1, 0) // 10, len(SIZE_UNITS) - 1)
+    return f"{bytes / (1 << (10 * i)):.2f} {SIZE_UNITS[i]}"
+
+
+def progress_hook(d):
+    """
+    Display download progress with detailed information about speed and time remaining.
+    Provides real-time feedback during the download process.
+    Updates are limited to one every PROGRESS_INTERVAL seconds.
+    Raises DownloadCancelled once a batch download has been cancelled.
+    """
+    if _cancel_event.is_set():
+        from yt_dlp.utils import DownloadCancelled
+        raise DownloadCancelled()
+
+    if d['status'] == 'downloading':
+        now = time.monotonic()
+        if now - _last_print[0] < PROGRESS_INTERVAL:
+            return
+        _last_print[0] = now
+
+        downloaded = d.get('downloaded_bytes', 0)
+        total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
+        
+        if total:
+            percentage = (downloaded / total) * 100
+            speed = d.get('speed', 0)
+            speed_str = format_size(speed) + '/s' if speed else 'N/A'
+            
+            eta = d.get('eta', None)
+            # eta is a number of seconds, not a timestamp
+            eta_str = f"{int(eta) // 60:02d}:{int(eta) % 60:02d}" if eta else 'N/A'
+            
+            progress = f"\rProgress: {percentage:.1f}% | Speed: {speed_str} | ETA: {eta_str}"
+            if _STDOUT_FD is None:
+                print(progress, end='', flush=True)
+            else:
+                os.write(_STDOUT_FD, progress.encode('utf-8', 'replace'))
+
+
+def parse_quality(quality):
+    """
+    Convert a quality such as '720p', '720' or 720 to a height in pixels.
+    Returns None if no quality is given or it isn't a valid number.
+    """
+    if not quality:
+        return None
+    try:
+        return int(str(quality).strip().rstrip('p'))
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=32)
+def get_best_format(target_height, ffmpeg_available):
+    """
+    Select the best video format based on desired quality and FFmpeg availability.
+    Handles both cases where FFmpeg is available and where it isn't.
+    A target_height of None selects the highest available quality.
+    Selectors are cached, as they only depend on the arguments.
+    """
+    height_filter = f'[height<={target_height}]' if target_height else ''
+    if ffmpeg_available:
+        # When FFmpeg is available, we can use separate video and audio streams
+        return f'bestvideo{height_filter}[ext=mp4]+bestaudio[ext=m4a]/best{height_filter}[ext=mp4]/best'
+    else:
+        # When FFmpeg isn't available, we need a merged format
+        return f'best{height_filter}[ext=mp4]/best[ext=mp4]/best'
+
+
+def _retry_sleep(n):
+    """
+    Number of seconds to wait before retry n (counting from 0), backing off
+    exponentially up to MAX_RETRY_SLEEP.
+    """
+    return min(4 ** n, MAX_RETRY_SLEEP)
+
+
+def get_temp_path(output_path):
+    """
+    Scratch directory for the partial and intermediate files of downloads to
+    output_path, inside the system temporary directory (set with TMPDIR).
+    Every output directory gets its own, so a partial download is only ever
+    resumed into the directory it was started for.
+    """
+    key = hashlib.sha1(os.path.abspath(output_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f'ytdownloader-{key}')
+
+
+def build_ydl_opts(output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build the yt-dlp options shared by single and batch downloads.
+    Partial and intermediate files are written to get_temp_path(output_path)
+    and only the finished video is moved to output_path, so slow output disks
+    aren't read and written at once.
+    Interrupted downloads resume from their .part file when run again.
+    """
+    ydl_opts = {
+        'progress_hooks': [progress_hook],
+        'outtmpl': OUTPUT_TEMPLATE,
+        'paths': {'home': output_path, 'temp': get_temp_path(output_path)},
+        'verbose': False,
+        # Fetch DASH fragments in parallel
+        'concurrent_fragment_downloads': CONCURRENT_FRAGMENTS,
+        # Keep partial downloads and continue them instead of starting over
+        'continuedl': True,
+        'nopart': False,
+        'retries': RETRIES,
+        'fragment_retries': RETRIES,
+        'retry_sleep_functions': {'http': _retry_sleep, 'fragment': _retry_sleep}
+    }
+
+    # Split streams into ranged requests, which YouTube throttles far less
+    # than a single long-running GET
+    if chunk_size:
+        ydl_opts['http_chunk_size'] = chunk_size
+
+    # Impersonating a browser sends requests through curl_cffi over HTTP/2, so
+    # concurrent fragment requests share one connection instead of one each
+    if check_impersonation():
+        from yt_dlp.networking.impersonate import ImpersonateTarget
+        ydl_opts['impersonate'] = ImpersonateTarget.from_str(IMPERSONATE_TARGET)
+
+    return ydl_opts
+
+
+def create_ydl(ydl_opts, split_streams=False):
+    """
+    Create a YoutubeDL instance that can be reused for several downloads,
+    keeping its connections alive between them.
+    With split_streams, video+audio pairs are downloaded as separate streams
+    for mux_streams() instead of being merged by yt-dlp.
+    The caller is responsible for closing the instance.
+    """
+    import yt_dlp
+
+    ydl = yt_dlp.YoutubeDL(dict(ydl_opts))
+    if split_streams:
+        ydl.format_selector = _split_formats(ydl.format_selector)
+    return ydl
+
+
+def _download_one(ydl, url):
+    """
+    Download a single URL with the given YoutubeDL instance.
+    """
+    return ydl.download([url])
+
+
+def _split_formats(format_selector):
+    """
+    Wrap a yt-dlp format selector so that a selected video+audio pair is
+    downloaded as two separate streams instead of being merged by yt-dlp.
+    """
+    def select(ctx):
+        for f in format_selector(ctx):
+            yield from f.get('requested_formats', [f])
+    return select
+
+
+def _iter_videos(info):
+    """
+    Yield the info of every video in an extracted result, descending into
+    playlists.
+    """
+    if 'entries' in info:
+        for entry in info['entries'] or []:
+            # Entries that failed to extract are None
+            if entry:
+                yield from _iter_videos(entry)
+    else:
+        yield info
+
+
+def _output_filter(ydl, output_path, outputs, lock):
+    """
+    Build a yt-dlp match_filter for batch downloads that picks the final file
+    of every video and skips videos whose file already exists, as yt-dlp does
+    for single downloads.
+
+    Streams are staged outside output_path in batch mode, so yt-dlp can't
+    notice finished videos by itself. The filter is shared by all download
+    slots through outputs, which maps video ids to (final file, already
+    existed) pairs, and lock. A video whose title is taken by another video
+    in the same run gets its id added to the name instead of overwriting it.
+    Streams that another slot is already downloading are skipped too.
+    """
+    output_path = os.path.abspath(output_path)
+    claimed = {}
+    seen_streams = set()
+
+    def match_filter(info, *, incomplete=False):
+        if incomplete or 'id' not in info:
+            return None
+        video_id = info['id']
+        with lock:
+            if video_id not in outputs:
+                for template in (OUTPUT_TEMPLATE, UNIQUE_OUTPUT_TEMPLATE):
+                    output_file = ydl.prepare_filename(dict(info, ext='mp4'),
+                                                       outtmpl=os.path.join(output_path, template))
+                    if claimed.setdefault(output_file, video_id) == video_id:
+                        break
+                outputs[video_id] = (output_file, os.path.exists(output_file))
+            output_file, existed = outputs[video_id]
+            if existed:
+                return f"{output_file} has already been downloaded"
+            if 'format_id' in info:
+                if (video_id, info['format_id']) in seen_streams:
+                    return f"{info['format_id']} of {video_id} is already being downloaded"
+                seen_streams.add((video_id, info['format_id']))
+        return None
+
+    return match_filter
+
+
+def _download_streams(ydl, url, outputs):
+    """
+    Download the video and audio streams of a URL without merging them, using
+    a YoutubeDL instance created with split_streams and given an _output_filter().
+    Returns a (stream files, final video file) pair for every video that needs
+    muxing, which is more than one for playlists.
+    """
+    info = ydl.extract_info(url, download=True)
+    videos = []
+    for video in _iter_videos(info):
+        # Streams skipped by the filter have no file
+        streams = [d['filepath'] for d in video.get('requested_downloads', []) if d.get('filepath')]
+        output_file, existed = outputs.get(video['id'], (None, False))
+        if existed or (not streams and output_file):
+            # Already downloaded, or downloaded by another slot in this run
+            continue
+        videos.append((streams, output_file or video.get('title', video['id'])))
+    return videos
+
+
+async def mux_streams(streams, output_file):
+    """
+    Merge downloaded video and audio streams into output_file with FFmpeg.
+    Streams are copied without re-encoding and removed once merged.
+    An existing output_file is never overwritten.
+    """
+    if not streams:
+        raise RuntimeError(f"No streams were downloaded for {output_file}")
+
+    if len(streams) == 1:
+        # Only a merged format was available, so there is nothing to mux
+        destination = os.path.splitext(output_file)[0] + os.path.splitext(streams[0])[1]
+        if os.path.exists(destination):
+            raise FileExistsError(f"{destination} already exists")
+        shutil.move(streams[0], destination)
+        return
+
+    cmd = ['ffmpeg', '-n', '-loglevel', 'error']
+    for stream in streams:
+        cmd += ['-i', stream]
+    cmd += ['-c', 'copy', output_file]
+
+    # Only stderr is read; FFmpeg's stdin and stdout are not needed
+    process = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.DEVNULL,
+                                                   stdout=asyncio.subprocess.DEVNULL,
+                                                   stderr=asyncio.subprocess.PIPE)
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed to merge {output_file}: {stderr.decode(errors='replace').strip()}")
+
+    for stream in streams:
+        os.remove(stream)
+
+
+def _print_troubleshooting():
+    """
+    Print suggestions for fixing a failed download.
+    """
+    print("\nTroubleshooting tips:")
+    print("1. Check your internet connection")
+    print("2. Verify the video URL is correct and accessible")
+    print("3. Try updating yt-dlp: `pip install --upgrade yt-dlp`")
+    print("4. Make sure the video isn't private or age-restricted")
+    print("5. If you want access to all quality options, run `choco install FFmpeg`")
+
+
+def download_video(url, preferred_quality=None, output_path='downloads', chunk_size=DEFAULT_CHUNK_SIZE, ydl=None):
+    """
+    Download a YouTube video with specified quality using yt-dlp.
+    Handles cases both with and without FFmpeg installed.
+    If the preferred quality isn't available, the user is asked to pick one.
+    When stdin isn't a terminal, the best quality up to the preferred one is
+    used instead, or the highest quality if none was given.
+    
+    Args:
+        url (str): YouTube video URL
+        preferred_quality (str or int): Preferred video quality (e.g., '720p', '1080p' or 720)
+        output_path (str): Directory to save the downloaded video
+        chunk_size (int): Size of each ranged HTTP request in bytes, or None to
+            download each stream with a single request
+        ydl (YoutubeDL): Instance from create_ydl() to reuse instead of creating
+            a new one. Its options take the place of output_path and chunk_size.
+
+    Returns:
+        bool: True if the video was downloaded, False otherwise
+    """
+    try:
+        import yt_dlp
+
+        # Check if FFmpeg is available
+        ffmpeg_available = check_ffmpeg()
+        if not ffmpeg_available:
+            print("\nNotice: FFmpeg is not installed. Some high-quality options may be limited.")
+            print("The script will automatically select the best available compatible format.")
+            print("To enable all quality options, please install FFmpeg and add it to your system PATH.")
+
+        # Create output directory if it doesn't exist
+        os.makedirs(output_path, exist_ok=True)
+
+        print("Fetching video information...")
+        
+        # Create a yt-dlp object, unless one is being reused, and get video info
+        if ydl is None:
+            ydl_context = yt_dlp.YoutubeDL(build_ydl_opts(output_path, chunk_size))
+        else:
+            ydl_context = contextlib.nullcontext(ydl)
+        with ydl_context as ydl:
+            # Get video information
+            info = ydl.extract_info(url, download=False)
+            
+            # Display video information
+            print(f"\nVideo Title: {info.get('title', 'Unknown')}")
+            duration = int(info.get('duration', 0))
+            print(f"Duration: {duration // 60}:{duration % 60:02d}")
+            
+            # Get available formats and filter based on FFmpeg availability
+            formats = info.get('formats', [])
+
+            # Collect available heights, considering FFmpeg availability.
+            # If FFmpeg isn't available, only include formats that have both video and audio
+            # Sorted from lowest to highest
+            heights = sorted({f['height'] for f in formats
+                              if f.get('height') and (ffmpeg_available or f.get('acodec') != 'none')})
+            
+            print("\nAvailable qualities:")
+            for i, h in enumerate(heights, 1):
+                print(f"{i}. {h}p")
+
+            # Handle quality selection
+            height = parse_quality(preferred_quality)
+            if height not in heights and not sys.stdin.isatty():
+                # Nobody to ask when running unattended
+                if height is None:
+                    if preferred_quality:
+                        print(f"\nNotice: '{preferred_quality}' is not a valid quality. Downloading the highest available quality instead.")
+                    height = heights[-1] if heights else None
+                else:
+                    # Keep the requested height as a cap, as in batch mode
+                    print(f"\nNotice: {height}p is not available. Downloading the best quality up to {height}p instead.")
+            elif height not in heights:
+                print("\nPlease select a quality from the available options:")
+                while True:
+                    try:
+                        choice = int(input("Enter the number of your choice: "))
+                        if 1 <= choice <= len(heights):
+                            height = heights[choice-1]
+                            break
+                        else:
+                            print("Invalid choice. Please try again.")
+                    except ValueError:
+                        print("Please enter a valid number.")
+
+            # Set format based on selected quality and FFmpeg availability
+            ydl.params['format'] = get_best_format(height, ffmpeg_available)
+            ydl.format_selector = ydl.build_format_selector(ydl.params['format'])
+            
+            # Flushed so it isn't overtaken by the progress written to the raw descriptor
+            print(f"\nDownloading video in {f'{height}p' if height else 'the best available quality'}...", flush=True)
+            
+            # Download the video from the info already fetched, so the page
+            # isn't extracted a second time
+            ydl.process_ie_result(info, download=True)
+            
+            print("\nDownload completed successfully!")
+            return True
+            
+    except Exception as e:
+        print(f"\nAn error occurred: {str(e)}")
+        _print_troubleshooting()
+        return False
+
+
+async def download_many(urls, preferred_quality=None, output_path='downloads', concurrency=DEFAULT_JOBS,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Download several YouTube videos concurrently using yt-dlp.
+    Quality is not prompted for in batch mode; without a preferred quality
+    the best available format is downloaded.
+
+    When FFmpeg is available, video and audio are downloaded separately and
+    muxed in a second stage, so one video is merged while the next downloads.
+
+    Each concurrent download slot owns one YoutubeDL, which is reused for every
+    URL downloaded in that slot. Connections stay alive between videos, while
+    no instance is ever used by two threads at once.
+
+    Args:
+        urls (list): YouTube video URLs
+        preferred_quality (str or int): Preferred video quality (e.g., '720p', '1080p' or 720)
+        output_path (str): Directory to save the downloaded videos
+        concurrency (int): Maximum number of videos downloaded at the same time
+        chunk_size (int): Size of each ranged HTTP request in bytes, or None to
+            download each stream with a single request
+
+    Returns:
+        list: 0 or the raised exception for each URL, in order. A URL given
+            more than once is downloaded once and shares its result.
+    """
+    # Downloading a URL twice at once would corrupt the shared .part files
+    unique_urls = list(dict.fromkeys(urls))
+    _cancel_event.clear()
+
+    ffmpeg_available = check_ffmpeg()
+    if not ffmpeg_available:
+        print("\nNotice: FFmpeg is not installed. Videos will be downloaded in the best merged format available.")
+
+    os.makedirs(output_path, exist_ok=True)
+
+    height = parse_quality(preferred_quality)
+    if preferred_quality and height is None:
+        print(f"\nNotice: '{preferred_quality}' is not a valid quality. Downloading the best available quality instead.")
+    try:
+        ydl_opts = build_ydl_opts(output_path, chunk_size)
+        ydl_opts['format'] = get_best_format(height, ffmpeg_available)
+        if ffmpeg_available:
+            ydl_opts['outtmpl'] = STREAM_TEMPLATE
+            temp_path = get_temp_path(output_path)
+            ydl_opts['paths'] = {'home': temp_path, 'temp': temp_path}
+
+        # Idle YoutubeDL instances; taking one from the queue claims a download slot
+        instances = [create_ydl(ydl_opts, split_streams=ffmpeg_available)
+                     for _ in range(max(min(concurrency, len(unique_urls)), 1))]
+    except Exception as e:
+        # e.g. yt-dlp isn't installed; every URL fails the same way
+        print(f"\nAn error occurred: {str(e)}")
+        _print_troubleshooting()
+        return [e] * len(urls)
+    # Final file of every video, shared by the download slots
+    outputs = {}
+    if ffmpeg_available:
+        lock = threading.Lock()
+        for ydl in instances:
+            ydl.params['match_filter'] = _output_filter(ydl, output_path, outputs, lock)
+    idle = asyncio.Queue()
+    for ydl in instances:
+        idle.put_nowait(ydl)
+    # Muxing is CPU and disk bound, so limit it separately from the downloads
+    mux_sem = asyncio.Semaphore(os.cpu_count() or 1)
+
+    async def run(url):
+        ydl = await idle.get()
+        try:
+            if not ffmpeg_available:
+                return await asyncio.to_thread(_download_one, ydl, url)
+            videos = await asyncio.to_thread(_download_streams, ydl, url, outputs)
+        finally:
+            idle.put_nowait(ydl)
+
+        # The download slot is released before muxing so the next URL can start
+        async def mux(streams, output_file):
+            async with mux_sem:
+                await mux_streams(streams, output_file)
+
+        # Every video of a playlist is muxed, even if one of them fails
+        results = await asyncio.gather(*(mux(*video) for video in videos), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return 0
+
+    # Flushed so it isn't overtaken by the progress written to the raw descriptor
+    print(f"Downloading {len(unique_urls)} videos, {len(instances)} at a time...", flush=True)
+    try:
+        results = await asyncio.gather(*(run(url) for url in unique_urls), return_exceptions=True)
+    except BaseException:
+        # e.g. Ctrl+C; asyncio.run() waits for the worker threads to return
+        _cancel_event.set()
+        raise
+    finally:
+        for ydl in instances:
+            ydl.close()
+
+    failed = [(url, result) for url, result in zip(unique_urls, results) if isinstance(result, Exception)]
+    print(f"\n{len(unique_urls) - len(failed)} of {len(unique_urls)} downloads completed successfully.")
+    for url, error in failed:
+        print(f"Failed: {url} ({error})")
+
+    by_url = dict(zip(unique_urls, results))
+    return [by_url[url] for url in urls]